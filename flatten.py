@@ -1,85 +1,115 @@
 import argparse
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import re
 
-IGNORED_DIRS = {'node_modules', 'flatten', '.vscode', '.solid', '.git', 'dist', 'build', 'coverage', '__pycache__', '.next', '.nuxt', '.cache', '.idea', '.DS_Store'}
-IGNORED_FILES = {'.env', 'package-lock.json', 'flatten.py', 'app.css'}
+IGNORED_DIRS = frozenset({'node_modules', 'flatten', '.vscode', '.solid', '.git', 'dist', 'build', 'coverage', '__pycache__', '.next', '.nuxt', '.cache', '.idea', '.DS_Store'})
+IGNORED_FILES = frozenset({'.env', 'package-lock.json', 'flatten.py', 'app.css'})
 
-def is_ignored(path: Path):
-    return (
-        path.is_dir() and path.name in IGNORED_DIRS
-    ) or (
-        path.is_file() and path.name in IGNORED_FILES
-    )
+MIGRATION_RE = re.compile(r'^0\d{3}_')
 
-def unique_filename(dest_dir: Path, filename: str) -> str:
+def scan_files(src_dir: Path):
+    """Walk src_dir with os.scandir, yielding (directory, files) pairs.
+
+    Files are (name, path) tuples taken straight from the DirEntry, so
+    callers never re-join directory and name. Uses an explicit stack and a
+    single scandir per directory so ignored directories are pruned without
+    extra stat calls.
+    """
+    stack = [str(src_dir)]
+    while stack:
+        current = stack.pop()
+        files = []
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_symlink():
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in IGNORED_DIRS:
+                            stack.append(entry.path)
+                    else:
+                        files.append((entry.name, entry.path))
+        except OSError as e:
+            print(f"Erreur lecture dossier {current}: {e}")
+            continue
+        yield current, files
+
+def unique_filename(filename: str, taken: set) -> str:
     base, ext = os.path.splitext(filename)
     counter = 1
     new_name = filename
-    while (dest_dir / new_name).exists():
+    while new_name in taken:
         new_name = f"{base}_{counter}{ext}"
         counter += 1
     return new_name
 
 def filter_files(files, in_migrations):
-    """Filter files based on migration status and ignored files."""
-    filtered = []
-    for file in files:
-        if in_migrations:
-            if re.match(r'^0\d{3}_', file):
-                filtered.append(file)
-        else:
-            if file not in IGNORED_FILES:
-                filtered.append(file)
-    return filtered
-
-def build_comment_path(full_path: Path, src_dir: Path):
-    """Build the comment path for the file header."""
-    parts = full_path.parts
+    """Filter (name, path) pairs based on migration status and ignored files."""
+    if in_migrations:
+        return (file for file in files if MIGRATION_RE.match(file[0]))
+    return (file for file in files if file[0] not in IGNORED_FILES)
+
+def build_comment_prefix(root_path: Path, src_dir: Path) -> str:
+    """Build the directory part of the header comment, shared by its files."""
+    parts = root_path.parts
     try:
         idx = parts.index('Motriforge')
         return Path(*parts[idx:]).as_posix()
     except ValueError:
-        return str(full_path.relative_to(src_dir).as_posix())
+        if root_path == src_dir:
+            return ''
+        return root_path.relative_to(src_dir).as_posix()
 
-def read_file_content(full_path: Path):
-    """Read file content, return lines or None on error."""
+def read_file_content(full_path: str):
+    """Read the whole file content, return it as a string or None on error."""
     try:
         with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.readlines()
+            return f.read()
     except Exception as e:
         print(f"Erreur lecture fichier {full_path}: {e}")
         return None
 
-def write_flattened_file(dest_path: Path, comment_path: str, content):
-    """Write the flattened file with comment header."""
+def write_flattened_file(dest_path: Path, comment_path: str, content: str):
+    """Write the flattened file with comment header in a single os.write."""
+    data = f"// {comment_path}\n{content}".encode('utf-8')
     try:
-        with open(dest_path, 'w', encoding='utf-8') as out:
-            out.write(f"// {comment_path}\n")
-            out.writelines(content)
+        fd = os.open(dest_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
     except Exception as e:
         print(f"Erreur écriture fichier {dest_path}: {e}")
 
+def copy_flattened_file(full_path: str, comment_path: str, dest_path: Path):
+    """Read one source file and write its flattened copy."""
+    content = read_file_content(full_path)
+    if content is None:
+        return
+    write_flattened_file(dest_path, comment_path, content)
+
 def flatten_directory(src_dir: Path, dest_dir: Path):
-    if not dest_dir.exists():
-        dest_dir.mkdir(parents=True)
+    dest_dir.mkdir(parents=True, exist_ok=True)
 
-    for root, dirs, files in os.walk(src_dir):
-        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+    tasks = []
+    taken = {entry.name for entry in os.scandir(dest_dir)}
+    for root, files in scan_files(src_dir):
         root_path = Path(root)
         in_migrations = 'migrations' in root_path.parts
+        prefix = build_comment_prefix(root_path, src_dir)
 
         filtered_files = filter_files(files, in_migrations)
-        for file in filtered_files:
-            full_path = root_path / file
-            comment_path = build_comment_path(full_path, src_dir)
-            content = read_file_content(full_path)
-            if content is None:
-                continue
-            unique_name = unique_filename(dest_dir, file)
-            dest_path = dest_dir / unique_name
-            write_flattened_file(dest_path, comment_path, content)
+        for name, path in filtered_files:
+            comment_path = f"{prefix}/{name}" if prefix else name
+            unique_name = unique_filename(name, taken)
+            taken.add(unique_name)
+            tasks.append((path, comment_path, dest_dir / unique_name))
+
+    with ThreadPoolExecutor() as executor:
+        for future in [executor.submit(copy_flattened_file, *task) for task in tasks]:
+            future.result()
 
 
 def main():